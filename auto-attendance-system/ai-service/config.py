@@ -3,6 +3,7 @@ Configuration module for AI Service
 """
 
 import os
+from functools import lru_cache
 from typing import List
 
 class Settings:
@@ -38,4 +39,10 @@ class Settings:
     NUM_JITTERS: int = int(os.getenv("NUM_JITTERS", "1"))
     FACE_LOCATIONS_MODEL: str = os.getenv("FACE_LOCATIONS_MODEL", "hog")
 
-settings = Settings()
\ No newline at end of file
+@lru_cache()
+def get_settings() -> Settings:
+    """Get the shared settings instance (memoized singleton)"""
+    return Settings()
+
+# Module-level singleton kept for existing imports
+settings = get_settings()
\ No newline at end of file
@@ -2,27 +2,119 @@ import aiohttp
 import asyncio
 import json
 import os
+import time
 from typing import Dict, List, Optional, Any
 import logging
 from datetime import datetime
 
+# orjson serializes large payloads (bulk attendance updates, embeddings)
+# several times faster than the stdlib; fall back gracefully if missing
+try:
+    import orjson
+
+    def _json_serialize(obj: Any) -> str:
+        return orjson.dumps(obj).decode('utf-8')
+except ImportError:
+    orjson = None
+    _json_serialize = json.dumps
+
+# ijson lets us pull student records out of a large response body as it
+# streams in, instead of buffering and parsing the whole document
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
 logger = logging.getLogger(__name__)
 
+# Timestamp formatting cache: datetime.utcnow().isoformat() costs a
+# datetime allocation plus string formatting on every payload, but the
+# recognition timestamps only need second precision - format at most
+# once per second
+_last_iso_second = -1
+_last_iso_value = ""
+
+def utcnow_iso() -> str:
+    """ISO-8601 UTC timestamp, cached per second"""
+    global _last_iso_second, _last_iso_value
+    second = int(time.time())
+    if second != _last_iso_second:
+        _last_iso_second = second
+        _last_iso_value = datetime.utcfromtimestamp(second).isoformat()
+    return _last_iso_value
+
 class BackendIntegration:
     """
     Integration service for communication between AI service and backend
     Handles data exchange for student enrollment and attendance updates
     """
     
+    # Connection pool sizing for the shared session
+    POOL_LIMIT = 20
+    POOL_LIMIT_PER_HOST = 10
+    KEEPALIVE_TIMEOUT = 30
+
+    # TTLs for cached backend responses (seconds)
+    HEALTH_CACHE_TTL = 5.0
+    SESSION_INFO_CACHE_TTL = 30.0
+
+    # Attendance records per bulk-update request - bounds the serialized
+    # payload held in memory and keeps individual requests small
+    ATTENDANCE_BATCH_SIZE = 500
+
     def __init__(self, backend_url: str = None, timeout: int = 30):
         self.backend_url = backend_url or os.getenv("BACKEND_API_URL", "http://localhost:5001")
         self.timeout = aiohttp.ClientTimeout(total=timeout)
         self.session: Optional[aiohttp.ClientSession] = None
-    
+        # Small TTL cache: key -> (expiry monotonic time, value)
+        self._ttl_cache: Dict[str, Any] = {}
+        # ETag revalidation cache: url -> (etag, parsed value)
+        self._etag_cache: Dict[str, Any] = {}
+
+    def _conditional_headers(self, url: str) -> Optional[Dict[str, str]]:
+        """Build If-None-Match headers when we hold a cached ETag for url"""
+        entry = self._etag_cache.get(url)
+        if entry is not None:
+            return {'If-None-Match': entry[0]}
+        return None
+
+    def _store_etag(self, url: str, response: aiohttp.ClientResponse, value: Any):
+        """Remember the response value keyed by its ETag, if the backend sent one"""
+        etag = response.headers.get('ETag')
+        if etag:
+            self._etag_cache[url] = (etag, value)
+
+    def _cache_get(self, key: str):
+        """Return a cached value if present and not expired, else None"""
+        entry = self._ttl_cache.get(key)
+        if entry is not None:
+            expiry, value = entry
+            if time.monotonic() < expiry:
+                return value
+            del self._ttl_cache[key]
+        return None
+
+    def _cache_set(self, key: str, value: Any, ttl: float):
+        """Store a value with the given time-to-live"""
+        self._ttl_cache[key] = (time.monotonic() + ttl, value)
+
     async def _ensure_session(self):
-        """Ensure aiohttp session is created"""
+        """Ensure aiohttp session is created with a pooled connector"""
         if self.session is None or self.session.closed:
-            self.session = aiohttp.ClientSession(timeout=self.timeout)
+            # Keep-alive connection pool: without an explicit connector a
+            # fresh TCP handshake is paid whenever the session gets
+            # recreated, and idle connections are not reused aggressively
+            connector = aiohttp.TCPConnector(
+                limit=self.POOL_LIMIT,
+                limit_per_host=self.POOL_LIMIT_PER_HOST,
+                keepalive_timeout=self.KEEPALIVE_TIMEOUT,
+                enable_cleanup_closed=True
+            )
+            self.session = aiohttp.ClientSession(
+                timeout=self.timeout,
+                connector=connector,
+                json_serialize=_json_serialize
+            )
     
     async def close(self):
         """Close the aiohttp session"""
@@ -43,18 +135,32 @@ class BackendIntegration:
             await self._ensure_session()
             
             url = f"{self.backend_url}/api/students/class/{class_id}"
-            async with self.session.get(url) as response:
+            async with self.session.get(url, headers=self._conditional_headers(url)) as response:
+                if response.status == 304:
+                    students = self._etag_cache[url][1]
+                    logger.info("✅ Class %s roster unchanged (ETag hit)", class_id)
+                    return students
                 if response.status == 200:
-                    data = await response.json()
-                    students = data.get('students', [])
-                    logger.info(f"✅ Fetched {len(students)} students for class {class_id}")
+                    if ijson is not None:
+                        # Stream-parse the students array incrementally so a
+                        # large class roster never needs the full response
+                        # body resident as both bytes and parsed JSON
+                        students = [
+                            student
+                            async for student in ijson.items(response.content, 'students.item')
+                        ]
+                    else:
+                        data = await response.json()
+                        students = data.get('students', [])
+                    self._store_etag(url, response, students)
+                    logger.info("✅ Fetched %s students for class %s", len(students), class_id)
                     return students
                 else:
-                    logger.error(f"❌ Failed to fetch students: {response.status}")
+                    logger.error("❌ Failed to fetch students: %s", response.status)
                     return []
                     
         except Exception as e:
-            logger.error(f"❌ Error fetching class students: {e}")
+            logger.error("❌ Error fetching class students: %s", e)
             return []
     
     async def fetch_student_images(self, student_id: str) -> List[str]:
@@ -71,20 +177,56 @@ class BackendIntegration:
             await self._ensure_session()
             
             url = f"{self.backend_url}/api/students/{student_id}/images"
-            async with self.session.get(url) as response:
+            async with self.session.get(url, headers=self._conditional_headers(url)) as response:
+                if response.status == 304:
+                    images = self._etag_cache[url][1]
+                    logger.info("✅ Images for student %s unchanged (ETag hit)", student_id)
+                    return images
                 if response.status == 200:
                     data = await response.json()
                     images = data.get('images', [])
-                    logger.info(f"✅ Fetched {len(images)} images for student {student_id}")
+                    self._store_etag(url, response, images)
+                    logger.info("✅ Fetched %s images for student %s", len(images), student_id)
                     return images
                 else:
-                    logger.error(f"❌ Failed to fetch student images: {response.status}")
+                    logger.error("❌ Failed to fetch student images: %s", response.status)
                     return []
                     
         except Exception as e:
-            logger.error(f"❌ Error fetching student images: {e}")
+            logger.error("❌ Error fetching student images: %s", e)
             return []
     
+    async def fetch_students_images(self, student_ids: List[str],
+                                    max_concurrency: int = 8) -> Dict[str, List[str]]:
+        """
+        Fetch enrolled face images for many students concurrently
+
+        Issues the per-student requests with asyncio.gather, bounded by a
+        semaphore so a large class does not open one connection per
+        student at once.
+
+        Args:
+            student_ids: The student identifiers to fetch
+            max_concurrency: Maximum number of in-flight requests
+
+        Returns:
+            Mapping of student_id to their list of images
+        """
+        try:
+            semaphore = asyncio.Semaphore(max_concurrency)
+
+            async def fetch_one(student_id: str) -> List[str]:
+                async with semaphore:
+                    return await self.fetch_student_images(student_id)
+
+            results = await asyncio.gather(*(fetch_one(sid) for sid in student_ids))
+            logger.info("✅ Fetched images for %s students in parallel", len(student_ids))
+            return dict(zip(student_ids, results))
+
+        except Exception as e:
+            logger.error("❌ Error batch fetching student images: %s", e)
+            return {}
+
     async def update_attendance_records(self, session_id: str, attendance_data: List[Dict[str, Any]]) -> bool:
         """
         Update attendance records in the backend based on AI recognition results
@@ -98,29 +240,37 @@ class BackendIntegration:
         """
         try:
             await self._ensure_session()
-            
+
             url = f"{self.backend_url}/api/attendance/bulk-update"
-            
-            payload = {
-                "session_id": session_id,
-                "attendance_records": attendance_data,
-                "recognition_timestamp": datetime.utcnow().isoformat(),
-                "recognition_method": "ai_face_recognition"
-            }
-            
-            async with self.session.post(url, json=payload) as response:
-                if response.status == 200:
-                    result = await response.json()
-                    updated_count = result.get('updated_count', 0)
-                    logger.info(f"✅ Updated {updated_count} attendance records for session {session_id}")
-                    return True
-                else:
-                    error_text = await response.text()
-                    logger.error(f"❌ Failed to update attendance: {response.status} - {error_text}")
-                    return False
-                    
+
+            # Send the records in bounded batches so one giant payload is
+            # never serialized and buffered in memory all at once (the
+            # backend endpoint consumes JSON, so chunked JSON uploads
+            # stand in for a streamed multipart body)
+            total_updated = 0
+            for start in range(0, len(attendance_data), self.ATTENDANCE_BATCH_SIZE):
+                batch = attendance_data[start:start + self.ATTENDANCE_BATCH_SIZE]
+                payload = {
+                    "session_id": session_id,
+                    "attendance_records": batch,
+                    "recognition_timestamp": utcnow_iso(),
+                    "recognition_method": "ai_face_recognition"
+                }
+
+                async with self.session.post(url, json=payload) as response:
+                    if response.status == 200:
+                        result = await response.json()
+                        total_updated += result.get('updated_count', 0)
+                    else:
+                        error_text = await response.text()
+                        logger.error("❌ Failed to update attendance: %s - %s", response.status, error_text)
+                        return False
+
+            logger.info("✅ Updated %s attendance records for session %s", total_updated, session_id)
+            return True
+
         except Exception as e:
-            logger.error(f"❌ Error updating attendance records: {e}")
+            logger.error("❌ Error updating attendance records: %s", e)
             return False
     
     async def notify_recognition_complete(self, session_id: str, results: Dict[str, Any]) -> bool:
@@ -141,20 +291,20 @@ class BackendIntegration:
             
             payload = {
                 "recognition_results": results,
-                "completion_timestamp": datetime.utcnow().isoformat(),
+                "completion_timestamp": utcnow_iso(),
                 "ai_service_version": "4.0.0"
             }
             
             async with self.session.post(url, json=payload) as response:
                 if response.status == 200:
-                    logger.info(f"✅ Notified backend of recognition completion for session {session_id}")
+                    logger.info("✅ Notified backend of recognition completion for session %s", session_id)
                     return True
                 else:
-                    logger.error(f"❌ Failed to notify recognition completion: {response.status}")
+                    logger.error("❌ Failed to notify recognition completion: %s", response.status)
                     return False
                     
         except Exception as e:
-            logger.error(f"❌ Error notifying recognition completion: {e}")
+            logger.error("❌ Error notifying recognition completion: %s", e)
             return False
     
     async def get_session_info(self, session_id: str) -> Optional[Dict[str, Any]]:
@@ -168,20 +318,26 @@ class BackendIntegration:
             Session data or None if not found
         """
         try:
+            cached = self._cache_get(f"session_info:{session_id}")
+            if cached is not None:
+                return cached
+
             await self._ensure_session()
-            
+
             url = f"{self.backend_url}/api/sessions/{session_id}"
             async with self.session.get(url) as response:
                 if response.status == 200:
                     session_data = await response.json()
-                    logger.info(f"✅ Fetched session info for {session_id}")
+                    self._cache_set(f"session_info:{session_id}", session_data,
+                                    self.SESSION_INFO_CACHE_TTL)
+                    logger.info("✅ Fetched session info for %s", session_id)
                     return session_data
                 else:
-                    logger.error(f"❌ Failed to fetch session info: {response.status}")
+                    logger.error("❌ Failed to fetch session info: %s", response.status)
                     return None
                     
         except Exception as e:
-            logger.error(f"❌ Error fetching session info: {e}")
+            logger.error("❌ Error fetching session info: %s", e)
             return None
     
     async def health_check(self) -> bool:
@@ -192,14 +348,20 @@ class BackendIntegration:
             True if backend is healthy, False otherwise
         """
         try:
+            cached = self._cache_get("health")
+            if cached is not None:
+                return cached
+
             await self._ensure_session()
-            
+
             url = f"{self.backend_url}/health"
             async with self.session.get(url) as response:
-                return response.status == 200
+                healthy = response.status == 200
+                self._cache_set("health", healthy, self.HEALTH_CACHE_TTL)
+                return healthy
                 
         except Exception as e:
-            logger.error(f"❌ Backend health check failed: {e}")
+            logger.error("❌ Backend health check failed: %s", e)
             return False
 
 # Global backend integration instance
@@ -26,6 +26,12 @@ logging.basicConfig(
 
 logger = logging.getLogger(__name__)
 
+# Create required directories once at import; Path.mkdir with
+# parents+exist_ok is a single mkdirat per directory, and hoisting it
+# out of main() avoids repeating the syscalls on every reload cycle
+Path("static/uploads").mkdir(parents=True, exist_ok=True)
+Path("static/enrollments").mkdir(parents=True, exist_ok=True)
+
 def main():
     """
     Main function to start the AI service
@@ -37,30 +43,48 @@ def main():
         host = os.getenv("AI_SERVICE_HOST", "0.0.0.0")
         port = int(os.getenv("AI_SERVICE_PORT", 8000))
         reload = os.getenv("ENVIRONMENT", "development") == "development"
-        workers = int(os.getenv("WORKERS", 1))
-        
+        workers = int(os.getenv("WORKERS", 2 * (os.cpu_count() or 1) + 1))
+
         # Log configuration
         logger.info(f"📍 Host: {host}")
         logger.info(f"🔌 Port: {port}")
         logger.info(f"🔄 Reload: {reload}")
         logger.info(f"👥 Workers: {workers}")
         
-        # Create required directories
-        os.makedirs("static/uploads", exist_ok=True)
-        os.makedirs("static/enrollments", exist_ok=True)
-        logger.info("📁 Created static directories")
-        
         # Start the server
-        uvicorn.run(
-            "main:app",
-            host=host,
-            port=port,
-            reload=reload,
-            workers=workers if not reload else 1,  # Single worker for reload mode
-            log_level="info",
-            access_log=True
-        )
-        
+        if reload:
+            # Dev mode: single uvicorn process with auto-reload
+            # uvloop/httptools are C replacements for the asyncio loop
+            # and h11 parser (bundled with uvicorn[standard])
+            uvicorn.run(
+                "main:app",
+                host=host,
+                port=port,
+                reload=True,
+                workers=1,
+                loop="uvloop",
+                http="httptools",
+                log_level="info",
+                # The app's own timing middleware replaces uvicorn's
+                # per-request access log (and skips health probes)
+                access_log=False
+            )
+        else:
+            # Production: gunicorn master with uvicorn workers scales
+            # across cores. --preload imports the app once in the
+            # master so module-level state (torch/numpy imports, config)
+            # is forked copy-on-write; the FaceRecognizer itself is
+            # built in the startup event, i.e. per worker after fork,
+            # so model weights are NOT shared
+            os.execvp("gunicorn", [
+                "gunicorn",
+                "main:app",
+                "-k", "uvicorn.workers.UvicornWorker",
+                "-w", str(workers),
+                "-b", f"{host}:{port}",
+                "--preload"
+            ])
+
     except KeyboardInterrupt:
         logger.info("🛑 AI Service stopped by user")
     except Exception as e:
@@ -1,29 +1,64 @@
 """Test script to check FaceNet model embedding dimensions"""
 import torch
+from concurrent.futures import ThreadPoolExecutor
 from facenet_pytorch import InceptionResnetV1
 import numpy as np
 
+# The script only runs forwards; turning autograd off globally skips
+# graph bookkeeping on every op
+torch.set_grad_enabled(False)
+
 print("Testing FaceNet model dimensions...")
 print("-" * 50)
 
-# Test casia-webface
-print("\n1. Testing casia-webface model:")
-model_casia = InceptionResnetV1(pretrained='casia-webface').eval()
-print(f"   Model loaded: {model_casia.__class__.__name__}")
+# Checkpoint loading is I/O-bound (download/disk), so load both models
+# in parallel instead of back to back
+with ThreadPoolExecutor(max_workers=2) as pool:
+    casia_future = pool.submit(lambda: InceptionResnetV1(pretrained='casia-webface').eval())
+    vgg_future = pool.submit(lambda: InceptionResnetV1(pretrained='vggface2').eval())
+    model_casia = casia_future.result()
+    model_vgg = vgg_future.result()
 
 # Create a dummy input (batch_size=1, channels=3, height=160, width=160)
 dummy_input = torch.randn(1, 3, 160, 160)
 
-with torch.no_grad():
+# On a GPU, half precision halves both FLOPs and memory traffic for
+# this check; CPU stays float32
+if torch.cuda.is_available():
+    model_casia = model_casia.to("cuda").half()
+    model_vgg = model_vgg.to("cuda").half()
+    dummy_input = dummy_input.half().cuda()
+    # The input shape is fixed, so let cudnn cache its algo selection
+    torch.backends.cudnn.benchmark = True
+
+def maybe_trace(model, example):
+    """JIT-trace the model; fall back to eager if tracing trips"""
+    try:
+        return torch.jit.trace(model, example)
+    except Exception as e:
+        print(f"   (tracing failed, running eager: {e})")
+        return model
+
+# Tracing fuses pointwise ops (BN+ReLU) and takes the Python dispatcher
+# out of the forward - at batch 1 the dispatcher dominates the runtime
+model_name = model_casia.__class__.__name__
+model_casia = maybe_trace(model_casia, dummy_input)
+model_vgg = maybe_trace(model_vgg, dummy_input)
+
+print("\n1. Testing casia-webface model:")
+print(f"   Model loaded: {model_name}")
+
+# inference_mode is cheaper than no_grad: no version counters or view
+# tracking on the tensors it produces
+with torch.inference_mode():
     embedding_casia = model_casia(dummy_input)
     print(f"   Output shape: {embedding_casia.shape}")
     print(f"   Embedding dimension: {embedding_casia.shape[1]}")
 
 print("\n2. Testing vggface2 model:")
-model_vgg = InceptionResnetV1(pretrained='vggface2').eval()
-print(f"   Model loaded: {model_vgg.__class__.__name__}")
+print(f"   Model loaded: {model_name}")
 
-with torch.no_grad():
+with torch.inference_mode():
     embedding_vgg = model_vgg(dummy_input)
     print(f"   Output shape: {embedding_vgg.shape}")
     print(f"   Embedding dimension: {embedding_vgg.shape[1]}")
@@ -0,0 +1,40 @@
+"""Unit tests for the similarity matching fallbacks"""
+import numpy as np
+import pytest
+
+from app.utils.similarity import find_best_matches
+
+
+def _unit_vector(dim, seed):
+    rng = np.random.default_rng(seed)
+    vector = rng.standard_normal(dim).astype(np.float32)
+    return vector / np.linalg.norm(vector)
+
+
+@pytest.mark.parametrize("method", ["cosine", "euclidean"])
+def test_mixed_dimension_database_still_returns_matches(method):
+    """A legacy 128-d row among 512-d entries must not sink the scan"""
+    query = _unit_vector(512, seed=0)
+
+    # 512-d rows correlated with the query so they all score well above
+    # the 0.0 assigned to incomparable entries
+    database = []
+    student_ids = []
+    for i in range(1, 6):
+        noisy = query + 0.1 * _unit_vector(512, seed=i)
+        database.append((noisy / np.linalg.norm(noisy)).astype(np.float32))
+        student_ids.append(f"S{i}")
+
+    # Exact duplicate of the query should come out on top
+    database[2] = query.copy()
+
+    # Mixed-dimension entry forces the unstackable thread-pool path
+    database.append(_unit_vector(128, seed=99))
+    student_ids.append("LEGACY")
+
+    matches = find_best_matches(query, database, student_ids,
+                                top_k=3, method=method)
+
+    assert len(matches) == 3
+    assert matches[0][0] == "S3"
+    assert all(student_id != "LEGACY" for student_id, _ in matches)
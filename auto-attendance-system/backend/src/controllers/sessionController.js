@@ -34,8 +34,11 @@ const detectFacesWithAI = async (filePath) => {
       contentType: 'image/jpeg'
     });
 
-    // Make request to AI service - using detect-faces endpoint
-    const response = await axios.post(`${AI_SERVICE_URL}/detect-faces`, formData, {
+    // Make request to AI service - using detect-faces endpoint.
+    // legacy=1 keeps embeddings as plain JSON arrays; the default
+    // response packs them as base64 fp16, which this controller does
+    // not decode
+    const response = await axios.post(`${AI_SERVICE_URL}/detect-faces?legacy=1`, formData, {
       headers: {
         ...formData.getHeaders(),
         'Content-Type': 'multipart/form-data'